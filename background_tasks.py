@@ -1,22 +1,39 @@
 import asyncio
 import logging
+import os
 from datetime import datetime, timezone
-from database import SessionLocal, Transaction
+from celery import Celery
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from database import SessionLocal, Transaction, GET_TRANSACTION_BY_ID, create_task_engine
 
 logger = logging.getLogger(__name__)
 
+# Optional durable queue: set CELERY_BROKER_URL to dispatch processing to
+# Celery workers instead of the in-process event loop
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
+DEFAULT_QUEUE = "webhooks.default"
 
-async def process_transaction(transaction_id: str):
+celery_app = Celery(
+    "walnutfolks",
+    broker=CELERY_BROKER_URL or "redis://localhost:6379/0",
+)
+celery_app.conf.task_default_queue = DEFAULT_QUEUE
+
+
+async def process_transaction(transaction_id: str, session_factory=SessionLocal):
     """
     Background task to process a transaction.
     Includes 30-second delay to simulate external API calls.
+
+    Uses two short-lived sessions so no pooled connection is held
+    across the 30-second sleep. Callers on their own event loop (the
+    Celery wrapper) pass a session_factory bound to a loop-local engine.
     """
-    db = SessionLocal()
-    try:
-        # Fetch the transaction
-        transaction = db.query(Transaction).filter(
-            Transaction.transaction_id == transaction_id
-        ).first()
+    # First session: validate, then release the connection before sleeping
+    async with session_factory() as db:
+        result = await db.execute(GET_TRANSACTION_BY_ID, {"tid": transaction_id})
+        transaction = result.scalar_one_or_none()
 
         if not transaction:
             logger.warning(f"Transaction {transaction_id} not found")
@@ -27,44 +44,73 @@ async def process_transaction(transaction_id: str):
             logger.info(f"Transaction {transaction_id} already {transaction.status}")
             return
 
-        # Mark as processing
-        transaction.is_processing = True
-        transaction.processing_started_at = datetime.now(timezone.utc)
-        db.commit()
+    processing_started_at = datetime.now(timezone.utc)
 
-        logger.info(f"Starting processing for transaction {transaction_id}")
+    logger.info(f"Starting processing for transaction {transaction_id}")
 
-        # Simulate 30-second external API call
-        await asyncio.sleep(30)
+    # Simulate 30-second external API call (no DB connection checked out)
+    await asyncio.sleep(30)
 
-        # Mark as processed
-        transaction.status = "PROCESSED"
-        transaction.processed_at = datetime.now(timezone.utc)
-        transaction.is_processing = False
-        db.commit()
+    # Second session: single conditional UPDATE. The status guard makes
+    # this idempotent, so no separate "mark as processing" write is needed
+    async with session_factory() as db:
+        try:
+            result = await db.execute(
+                update(Transaction).where(
+                    Transaction.transaction_id == transaction_id,
+                    Transaction.status == "PROCESSING"
+                ).values(
+                    status="PROCESSED",
+                    processed_at=func.now(),
+                    processing_started_at=processing_started_at,
+                    is_processing=False
+                )
+            )
+            await db.commit()
 
-        logger.info(f"Successfully processed transaction {transaction_id}")
+            if result.rowcount:
+                logger.info(f"Successfully processed transaction {transaction_id}")
+            else:
+                logger.info(f"Transaction {transaction_id} was already finalized elsewhere")
 
-    except Exception as e:
-        logger.error(f"Error processing transaction {transaction_id}: {str(e)}")
-        transaction = db.query(Transaction).filter(
-            Transaction.transaction_id == transaction_id
-        ).first()
-        if transaction:
-            transaction.status = "FAILED"
-            transaction.error_message = str(e)
-            transaction.is_processing = False
-            db.commit()
-    finally:
-        db.close()
+        except Exception as e:
+            logger.error(f"Error processing transaction {transaction_id}: {str(e)}")
+            await db.rollback()
+            await db.execute(
+                update(Transaction).where(
+                    Transaction.transaction_id == transaction_id,
+                    Transaction.status == "PROCESSING"
+                ).values(
+                    status="FAILED",
+                    error_message=str(e),
+                    is_processing=False
+                )
+            )
+            await db.commit()
 
 
-def start_background_task(transaction_id: str):
+@celery_app.task(bind=True, max_retries=5, acks_late=True)
+def process_transaction_task(self, transaction_id: str):
     """
-    Create a background task for transaction processing.
-    Uses asyncio to run without blocking the request.
+    Celery wrapper around process_transaction for durable, horizontally
+    scalable processing. Survives a worker restart where in-process
+    BackgroundTasks would lose in-flight jobs.
+
+    Builds and disposes a NullPool engine inside each invocation's loop:
+    the module-level pooled engine would hand later invocations asyncpg
+    connections bound to an earlier, already-closed loop.
     """
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    loop.create_task(process_transaction(transaction_id))
-    # Don't close the loop, it will continue running in the background
+    async def run():
+        task_engine = create_task_engine()
+        try:
+            session_factory = async_sessionmaker(
+                task_engine, autoflush=False, expire_on_commit=False
+            )
+            await process_transaction(transaction_id, session_factory)
+        finally:
+            await task_engine.dispose()
+
+    try:
+        asyncio.run(run())
+    except Exception as exc:
+        raise self.retry(exc=exc, countdown=2 ** self.request.retries)
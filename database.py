@@ -1,49 +1,110 @@
-from datetime import datetime, timezone
-from typing import Optional
-from sqlalchemy import create_engine, Column, String, Float, DateTime, Boolean, Index
+from sqlalchemy import bindparam, event, func, lambda_stmt, select, Column, String, Float, DateTime, Boolean, Index
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 import os
 
-# Database setup
+# Database setup: async engine so DB I/O suspends the coroutine instead of
+# blocking the event loop. Plain URLs are upgraded to their async drivers.
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./transactions.db")
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+if DATABASE_URL.startswith("sqlite://") and "+aiosqlite" not in DATABASE_URL:
+    DATABASE_URL = DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+elif DATABASE_URL.startswith("postgresql://"):
+    DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+# Connection pool sized for concurrent webhook bursts; pre-ping drops stale
+# connections after DB restarts instead of handing them to requests.
+engine_kwargs = {
+    "pool_size": 10,
+    "max_overflow": 20,
+    "pool_timeout": 5,
+    "pool_pre_ping": True,
+    "pool_recycle": 1800,
+}
+if "sqlite" in DATABASE_URL:
+    engine_kwargs["connect_args"] = {"check_same_thread": False}
+else:
+    # Keep a small hot set of connections warm (Postgres production)
+    engine_kwargs["pool_use_lifo"] = True
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers run alongside the single writer instead of
+    # serializing everything behind the journal's global file lock
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+engine = create_async_engine(DATABASE_URL, **engine_kwargs)
+
+if "sqlite" in DATABASE_URL:
+    event.listens_for(engine.sync_engine, "connect")(_set_sqlite_pragmas)
+
+SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+
+def create_task_engine():
+    """
+    Engine for short-lived event loops (e.g. one Celery task invocation).
+
+    asyncpg connections are bound to the loop they were created on, so a
+    pooled connection must never outlive an asyncio.run call — NullPool
+    opens and closes a connection per use instead. Callers dispose the
+    engine before their loop exits.
+    """
+    task_engine = create_async_engine(
+        DATABASE_URL,
+        poolclass=NullPool,
+        connect_args=engine_kwargs.get("connect_args", {}),
+    )
+    if "sqlite" in DATABASE_URL:
+        event.listens_for(task_engine.sync_engine, "connect")(_set_sqlite_pragmas)
+    return task_engine
 Base = declarative_base()
 
 
 class Transaction(Base):
     __tablename__ = "transactions"
 
-    transaction_id = Column(String, primary_key=True, index=True)
+    transaction_id = Column(String, primary_key=True)
     source_account = Column(String, nullable=False)
     destination_account = Column(String, nullable=False)
     amount = Column(Float, nullable=False)
     currency = Column(String, nullable=False)
     status = Column(String, default="PROCESSING")  # PROCESSING, PROCESSED, FAILED
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    processed_at = Column(DateTime, nullable=True)
-    webhook_received_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    processing_started_at = Column(DateTime, nullable=True)
+    # DB-side timestamps: no per-write datetime.now() on the hot path, and
+    # one authoritative clock across processes
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+    webhook_received_at = Column(DateTime(timezone=True), server_default=func.now())
+    processing_started_at = Column(DateTime(timezone=True), nullable=True)
     is_processing = Column(Boolean, default=False)
     error_message = Column(String, nullable=True)
+    queue = Column(String, default="webhooks.default")
 
     __table_args__ = (
-        Index('idx_transaction_id_status', 'transaction_id', 'status'),
         Index('idx_status', 'status'),
     )
 
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Built once per process; callers execute it with {"tid": ...} so the Core
+# expression isn't reconstructed and recompiled on every lookup
+GET_TRANSACTION_BY_ID = lambda_stmt(
+    lambda: select(Transaction).where(
+        Transaction.transaction_id == bindparam("tid")
+    )
+)
+
+
+async def init_db():
+    """Create tables; called from the app's startup handler."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
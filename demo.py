@@ -6,8 +6,11 @@ Run this while the service is running to see it in action
 
 import asyncio
 import httpx
+import orjson
 import time
+from collections import Counter
 from datetime import datetime
+from itertools import islice
 
 BASE_URL = "http://localhost:8000"
 DEMO_TRANSACTIONS = []
@@ -20,21 +23,19 @@ async def print_header(title):
     print("=" * 70 + "\n")
 
 
-async def demo_health_check():
+async def demo_health_check(client):
     """Demo: Health check endpoint"""
     await print_header("DEMO 1: Health Check Endpoint")
     
-    async with httpx.AsyncClient() as client:
-        print("📡 Sending GET /\n")
-        response = await client.get(f"{BASE_URL}/")
-        
-        print(f"✅ Status Code: {response.status_code}")
-        print(f"📋 Response Body:")
-        import json
-        print(json.dumps(response.json(), indent=2))
+    print("📡 Sending GET /\n")
+    response = await client.get(f"{BASE_URL}/")
+
+    print(f"✅ Status Code: {response.status_code}")
+    print(f"📋 Response Body:")
+    print(orjson.dumps(response.json(), option=orjson.OPT_INDENT_2).decode())
 
 
-async def demo_single_webhook():
+async def demo_single_webhook(client):
     """Demo: Single webhook processing"""
     await print_header("DEMO 2: Single Webhook Processing")
     
@@ -49,44 +50,50 @@ async def demo_single_webhook():
         "currency": "USD"
     }
     
-    async with httpx.AsyncClient() as client:
-        print(f"📤 Sending webhook for transaction: {transaction_id}\n")
-        print("Request Body:")
-        import json
-        print(json.dumps(webhook_payload, indent=2))
-        
-        # Send webhook
-        response = await client.post(
-            f"{BASE_URL}/v1/webhooks/transactions",
-            json=webhook_payload
-        )
-        
-        print(f"\n✅ Status Code: {response.status_code} (202 Accepted)")
-        print("📋 Response Body:")
-        print(json.dumps(response.json(), indent=2))
-        
-        # Check immediate status
-        print(f"\n⏱️  Checking status immediately...")
-        response = await client.get(f"{BASE_URL}/v1/transactions/{transaction_id}")
-        txn = response.json()[0]
-        print(f"   Status: {txn['status']} (should be PROCESSING)")
-        
-        # Wait and check again
-        print(f"\n⏳ Waiting 35 seconds for background processing...")
-        for i in range(35):
-            if i % 5 == 0 and i > 0:
-                print(f"   {i}s elapsed...", end=" ", flush=True)
-            await asyncio.sleep(1)
-        print()
-        
-        print(f"\n📊 Checking final status...")
-        response = await client.get(f"{BASE_URL}/v1/transactions/{transaction_id}")
-        txn = response.json()[0]
-        print(f"   Status: {txn['status']} (should be PROCESSED)")
-        print(f"   Processed At: {txn['processed_at']}")
-
-
-async def demo_duplicate_prevention():
+    print(f"📤 Sending webhook for transaction: {transaction_id}\n")
+    print("Request Body:")
+    print(orjson.dumps(webhook_payload, option=orjson.OPT_INDENT_2).decode())
+
+    # Send webhook
+    response = await client.post(
+        f"{BASE_URL}/v1/webhooks/transactions",
+        json=webhook_payload
+    )
+
+    print(f"\n✅ Status Code: {response.status_code} (202 Accepted)")
+    print("📋 Response Body:")
+    print(orjson.dumps(response.json(), option=orjson.OPT_INDENT_2).decode())
+
+    # Check immediate status
+    print(f"\n⏱️  Checking status immediately...")
+    response = await client.get(f"{BASE_URL}/v1/transactions/{transaction_id}")
+    txn = response.json()[0]
+    print(f"   Status: {txn['status']} (should be PROCESSING)")
+
+    # Wait and check again: one long sleep plus a 5s progress ticker
+    # instead of 35 one-second timer hops through the event loop
+    print(f"\n⏳ Waiting 35 seconds for background processing...")
+
+    async def progress_ticker():
+        elapsed = 0
+        while True:
+            await asyncio.sleep(5)
+            elapsed += 5
+            print(f"   {elapsed}s elapsed...", end=" ", flush=True)
+
+    ticker = asyncio.create_task(progress_ticker())
+    await asyncio.sleep(35)
+    ticker.cancel()
+    print()
+
+    print(f"\n📊 Checking final status...")
+    response = await client.get(f"{BASE_URL}/v1/transactions/{transaction_id}")
+    txn = response.json()[0]
+    print(f"   Status: {txn['status']} (should be PROCESSED)")
+    print(f"   Processed At: {txn['processed_at']}")
+
+
+async def demo_duplicate_prevention(client):
     """Demo: Duplicate webhook prevention"""
     await print_header("DEMO 3: Duplicate Webhook Prevention (Idempotency)")
     
@@ -101,105 +108,100 @@ async def demo_duplicate_prevention():
         "currency": "INR"
     }
     
-    async with httpx.AsyncClient() as client:
-        # Send the same webhook 3 times
-        print(f"📤 Sending the SAME webhook 3 times...\n")
-        
-        for i in range(3):
-            print(f"   Attempt #{i+1}...", end="", flush=True)
-            response = await client.post(
-                f"{BASE_URL}/v1/webhooks/transactions",
-                json=webhook_payload
-            )
-            print(f" ✅ {response.status_code} Accepted")
-            await asyncio.sleep(0.5)  # Brief pause between requests
-        
-        # Verify only one transaction exists
-        print(f"\n📊 Checking database...")
-        response = await client.get(f"{BASE_URL}/v1/transactions")
-        all_txns = response.json()
-        duplicate_txns = [t for t in all_txns if t['transaction_id'] == transaction_id]
-        
-        print(f"   Total transactions in system: {len(all_txns)}")
-        print(f"   Duplicate transaction count: {len(duplicate_txns)}")
-        print(f"\n✅ Result: Only 1 transaction created (Idempotency works!)")
+    # Send the same webhook 3 times
+    print(f"📤 Sending the SAME webhook 3 times...\n")
+
+    for i in range(3):
+        print(f"   Attempt #{i+1}...", end="", flush=True)
+        response = await client.post(
+            f"{BASE_URL}/v1/webhooks/transactions",
+            json=webhook_payload
+        )
+        print(f" ✅ {response.status_code} Accepted")
+        await asyncio.sleep(0.5)  # Brief pause between requests
 
+    # Verify only one transaction exists
+    print(f"\n📊 Checking database...")
+    response = await client.get(f"{BASE_URL}/v1/transactions")
+    all_txns = response.json()
+    duplicate_txns = [t for t in all_txns if t['transaction_id'] == transaction_id]
 
-async def demo_performance():
+    print(f"   Total transactions in system: {len(all_txns)}")
+    print(f"   Duplicate transaction count: {len(duplicate_txns)}")
+    print(f"\n✅ Result: Only 1 transaction created (Idempotency works!)")
+
+
+async def demo_performance(client):
     """Demo: Performance under load"""
     await print_header("DEMO 4: Performance Under Load")
     
-    async with httpx.AsyncClient() as client:
-        print(f"📤 Sending 10 webhooks rapidly...\n")
-        
-        start_time = time.time()
-        response_times = []
-        
-        for i in range(10):
-            webhook_payload = {
-                "transaction_id": f"demo_perf_{int(time.time())}_{i}",
-                "source_account": f"acc_user_{i}",
-                "destination_account": "acc_merchant_shop",
-                "amount": 500 + (i * 50),
-                "currency": "USD"
-            }
-            
-            req_start = time.time()
-            response = await client.post(
-                f"{BASE_URL}/v1/webhooks/transactions",
-                json=webhook_payload
-            )
-            req_time = (time.time() - req_start) * 1000  # Convert to ms
-            response_times.append(req_time)
-            
-            print(f"   Request #{i+1}: {req_time:.2f}ms ✅")
-            DEMO_TRANSACTIONS.append(webhook_payload['transaction_id'])
-        
-        total_time = time.time() - start_time
-        avg_time = sum(response_times) / len(response_times)
-        max_time = max(response_times)
-        min_time = min(response_times)
-        
-        print(f"\n📊 Performance Metrics:")
-        print(f"   Total Time: {total_time:.2f}s")
-        print(f"   Average Response Time: {avg_time:.2f}ms")
-        print(f"   Min Response Time: {min_time:.2f}ms")
-        print(f"   Max Response Time: {max_time:.2f}ms")
-        print(f"\n✅ All responses well under 500ms requirement!")
+    print(f"📤 Sending 10 webhooks concurrently...\n")
+
+    payloads = [
+        {
+            "transaction_id": f"demo_perf_{int(time.time())}_{i}",
+            "source_account": f"acc_user_{i}",
+            "destination_account": "acc_merchant_shop",
+            "amount": 500 + (i * 50),
+            "currency": "USD"
+        }
+        for i in range(10)
+    ]
+
+    async def timed_post(payload):
+        req_start = time.time()
+        await client.post(
+            f"{BASE_URL}/v1/webhooks/transactions",
+            json=payload
+        )
+        return (time.time() - req_start) * 1000  # Convert to ms
+
+    start_time = time.time()
+    response_times = await asyncio.gather(*(timed_post(p) for p in payloads))
 
+    for i, req_time in enumerate(response_times):
+        print(f"   Request #{i+1}: {req_time:.2f}ms ✅")
+        DEMO_TRANSACTIONS.append(payloads[i]['transaction_id'])
 
-async def demo_list_all():
+    total_time = time.time() - start_time
+    avg_time = sum(response_times) / len(response_times)
+    max_time = max(response_times)
+    min_time = min(response_times)
+
+    print(f"\n📊 Performance Metrics:")
+    print(f"   Total Time: {total_time:.2f}s")
+    print(f"   Average Response Time: {avg_time:.2f}ms")
+    print(f"   Min Response Time: {min_time:.2f}ms")
+    print(f"   Max Response Time: {max_time:.2f}ms")
+    print(f"\n✅ All responses well under 500ms requirement!")
+
+
+async def demo_list_all(client):
     """Demo: List all transactions"""
     await print_header("DEMO 5: View All Transactions")
     
-    async with httpx.AsyncClient() as client:
-        print(f"📊 Fetching all transactions...\n")
-        response = await client.get(f"{BASE_URL}/v1/transactions")
-        transactions = response.json()
-        
-        print(f"Total Transactions: {len(transactions)}\n")
-        
-        # Group by status
-        statuses = {}
-        for txn in transactions:
-            status = txn['status']
-            if status not in statuses:
-                statuses[status] = 0
-            statuses[status] += 1
-        
-        for status, count in statuses.items():
-            print(f"  {status}: {count}")
-        
-        print(f"\n📋 Recent Transactions:")
-        print("-" * 70)
-        
-        for i, txn in enumerate(transactions[:5]):
-            print(f"\n{i+1}. {txn['transaction_id']}")
-            print(f"   Amount: {txn['amount']} {txn['currency']}")
-            print(f"   Status: {txn['status']}")
-            print(f"   Created: {txn['created_at']}")
-            if txn['processed_at']:
-                print(f"   Processed: {txn['processed_at']}")
+    print(f"📊 Fetching all transactions...\n")
+    response = await client.get(f"{BASE_URL}/v1/transactions")
+    transactions = response.json()
+
+    print(f"Total Transactions: {len(transactions)}\n")
+
+    # Group by status
+    statuses = Counter(txn['status'] for txn in transactions)
+
+    for status, count in statuses.items():
+        print(f"  {status}: {count}")
+
+    print(f"\n📋 Recent Transactions:")
+    print("-" * 70)
+
+    for i, txn in enumerate(islice(transactions, 5)):
+        print(f"\n{i+1}. {txn['transaction_id']}")
+        print(f"   Amount: {txn['amount']} {txn['currency']}")
+        print(f"   Status: {txn['status']}")
+        print(f"   Created: {txn['created_at']}")
+        if txn['processed_at']:
+            print(f"   Processed: {txn['processed_at']}")
 
 
 async def main():
@@ -210,13 +212,15 @@ async def main():
     print("╚" + "=" * 68 + "╝")
     
     try:
-        # Run demos
-        await demo_health_check()
-        await demo_single_webhook()
-        await demo_duplicate_prevention()
-        await demo_performance()
-        await demo_list_all()
-        
+        # One client for the whole demo so every request reuses the same
+        # TCP connection instead of paying a handshake per call
+        async with httpx.AsyncClient(base_url=BASE_URL, http2=True) as client:
+            await demo_health_check(client)
+            await demo_single_webhook(client)
+            await demo_duplicate_prevention(client)
+            await demo_performance(client)
+            await demo_list_all(client)
+
         # Summary
         await print_header("DEMO COMPLETE ✅")
         print("""
@@ -247,13 +251,4 @@ Your service is ready for production! 🚀
 
 
 if __name__ == "__main__":
-    # Ensure httpx is available
-    try:
-        import httpx
-    except ImportError:
-        print("Installing httpx...")
-        import subprocess
-        import sys
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "httpx"])
-    
     asyncio.run(main())
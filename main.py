@@ -1,18 +1,33 @@
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, status
+from fastapi import FastAPI, HTTPException, Depends, Query, status
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timezone
+import asyncio
 import logging
-import threading
-from database import get_db, Transaction
+import orjson
+import os
+from database import get_db, init_db, Transaction, GET_TRANSACTION_BY_ID
 from schemas import TransactionWebhook, TransactionResponse, HealthCheckResponse
-from background_tasks import process_transaction
+from background_tasks import (
+    CELERY_BROKER_URL,
+    DEFAULT_QUEUE,
+    process_transaction,
+    process_transaction_task,
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Transaction Webhook Service", version="1.0.0")
+app = FastAPI(
+    title="Transaction Webhook Service",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+)
 
 # Configure CORS
 app.add_middleware(
@@ -28,15 +43,70 @@ app.add_middleware(
 )
 
 
-# Helper function to process transaction in a thread
-def process_in_background(transaction_id: str):
-    """Process transaction in a separate thread"""
-    def run():
-        import asyncio
-        asyncio.run(process_transaction(transaction_id))
-    
-    thread = threading.Thread(target=run, daemon=True)
-    thread.start()
+@app.on_event("startup")
+async def create_tables():
+    await init_db()
+
+
+@app.on_event("startup")
+async def enable_eager_tasks():
+    """Run background coroutines eagerly until their first await (Python 3.12+)"""
+    if hasattr(asyncio, "eager_task_factory"):
+        asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
+
+
+# Bounded in-process queue: caps in-flight processing coroutines and sheds
+# load with a 503 instead of accumulating unbounded tasks on the loop
+QUEUE_MAXSIZE = int(os.getenv("PROCESSING_QUEUE_MAXSIZE", "1000"))
+QUEUE_WORKERS = int(os.getenv("PROCESSING_QUEUE_WORKERS", "50"))
+QUEUE_HIGH_WATER = int(QUEUE_MAXSIZE * 0.9)
+
+processing_queue: asyncio.Queue = None
+_queue_tasks = []
+
+
+async def _queue_worker():
+    while True:
+        transaction_id = await processing_queue.get()
+        try:
+            await process_transaction(transaction_id)
+        except Exception:
+            logger.exception(f"Unhandled error processing {transaction_id}")
+        finally:
+            processing_queue.task_done()
+
+
+async def _monitor_queue_depth():
+    """Log an error if the queue stays above its high-water mark for >5s"""
+    backed_up_since = None
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(1)
+        if processing_queue.qsize() > QUEUE_HIGH_WATER:
+            if backed_up_since is None:
+                backed_up_since = loop.time()
+            elif loop.time() - backed_up_since > 5:
+                logger.error(
+                    f"Processing queue backed up: {processing_queue.qsize()}/{QUEUE_MAXSIZE}"
+                )
+        else:
+            backed_up_since = None
+
+
+@app.on_event("startup")
+async def start_queue_workers():
+    global processing_queue
+    processing_queue = asyncio.Queue(maxsize=QUEUE_MAXSIZE)
+    for _ in range(QUEUE_WORKERS):
+        _queue_tasks.append(asyncio.create_task(_queue_worker()))
+    _queue_tasks.append(asyncio.create_task(_monitor_queue_depth()))
+
+
+@app.on_event("shutdown")
+async def stop_queue_workers():
+    for task in _queue_tasks:
+        task.cancel()
+    _queue_tasks.clear()
 
 
 @app.api_route("/", response_model=HealthCheckResponse, methods=["GET", "HEAD"])
@@ -51,58 +121,71 @@ async def health_check():
 @app.post("/v1/webhooks/transactions", status_code=status.HTTP_202_ACCEPTED)
 async def receive_webhook(
     webhook: TransactionWebhook,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Receive transaction webhook from payment processor.
     Responds with 202 Accepted immediately and processes in background.
     """
     transaction_id = webhook.transaction_id
+    queue = webhook.priority_queue or DEFAULT_QUEUE
 
-    # Check if transaction already exists (idempotency check)
-    existing = db.query(Transaction).filter(
-        Transaction.transaction_id == transaction_id
-    ).first()
-
-    if existing:
-        logger.info(f"Webhook received for existing transaction {transaction_id}, status: {existing.status}")
-        # Return 202 Accepted even if already processing
-        return {"message": "Webhook acknowledged", "transaction_id": transaction_id}
-
-    # Create new transaction record
-    transaction = Transaction(
+    # Atomic idempotency check: insert and ignore conflicts in one round trip
+    # instead of a racy SELECT-then-INSERT
+    insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(Transaction).values(
         transaction_id=transaction_id,
         source_account=webhook.source_account,
         destination_account=webhook.destination_account,
         amount=webhook.amount,
         currency=webhook.currency,
         status="PROCESSING",
-        created_at=datetime.now(timezone.utc),
-        webhook_received_at=datetime.now(timezone.utc)
-    )
+        queue=queue
+    ).on_conflict_do_nothing(index_elements=["transaction_id"])
 
-    db.add(transaction)
-    db.commit()
-    db.refresh(transaction)
+    result = await db.execute(stmt)
+    await db.commit()
+
+    if result.rowcount == 0:
+        logger.info(f"Webhook received for existing transaction {transaction_id}, skipping")
+        # Return 202 Accepted even if already processing
+        return {"message": "Webhook acknowledged", "transaction_id": transaction_id}
 
     logger.info(f"Webhook received for transaction {transaction_id}, queuing for processing")
 
-    # Start background processing (non-blocking)
-    process_in_background(transaction_id)
+    # Dispatch to Celery when a broker is configured (durable, scales out,
+    # per-priority queues); otherwise enqueue for the in-process worker pool
+    if CELERY_BROKER_URL:
+        process_transaction_task.apply_async(args=[transaction_id], queue=queue)
+    else:
+        try:
+            processing_queue.put_nowait(transaction_id)
+        except asyncio.QueueFull:
+            # Undo the insert so the retry we ask for below re-inserts and
+            # re-enqueues instead of bouncing off the idempotency check
+            logger.error(f"Processing queue full, shedding webhook {transaction_id}")
+            await db.execute(
+                delete(Transaction).where(
+                    Transaction.transaction_id == transaction_id
+                )
+            )
+            await db.commit()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Processing queue full, retry later"
+            )
 
     return {"message": "Webhook acknowledged", "transaction_id": transaction_id}
 
 
 @app.get("/v1/transactions/{transaction_id}", response_model=list[TransactionResponse])
-async def get_transaction(transaction_id: str, db: Session = Depends(get_db)):
+async def get_transaction(transaction_id: str, db: AsyncSession = Depends(get_db)):
     """
     Retrieve transaction status.
     Returns a list with the transaction details.
     """
-    transaction = db.query(Transaction).filter(
-        Transaction.transaction_id == transaction_id
-    ).first()
+    result = await db.execute(GET_TRANSACTION_BY_ID, {"tid": transaction_id})
+    transaction = result.scalar_one_or_none()
 
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
@@ -110,18 +193,39 @@ async def get_transaction(transaction_id: str, db: Session = Depends(get_db)):
     return [TransactionResponse.model_validate(transaction)]
 
 
-@app.get("/v1/transactions", response_model=list[TransactionResponse])
-async def list_transactions(db: Session = Depends(get_db)):
+@app.get("/v1/transactions", responses={200: {"model": list[TransactionResponse]}})
+async def list_transactions(
+    limit: int = Query(500, ge=1, le=10000),
+    db: AsyncSession = Depends(get_db)
+):
     """
-    List all transactions (useful for testing).
+    List transactions (useful for testing), newest first.
+    Streams the JSON array in DB batches so memory stays O(batch),
+    not O(table size).
     """
-    transactions = db.query(Transaction).order_by(
-        Transaction.webhook_received_at.desc()
-    ).all()
+    result = await db.stream(
+        select(Transaction)
+        .order_by(Transaction.webhook_received_at.desc())
+        .limit(limit)
+        .execution_options(yield_per=500)
+    )
+    rows = result.scalars()
+
+    async def stream():
+        yield b"["
+        i = 0
+        async for transaction in rows:
+            if i:
+                yield b","
+            i += 1
+            yield orjson.dumps(
+                TransactionResponse.model_validate(transaction).model_dump()
+            )
+        yield b"]"
 
-    return [TransactionResponse.model_validate(t) for t in transactions]
+    return StreamingResponse(stream(), media_type="application/json")
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop="uvloop", http="httptools")
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional
 from datetime import datetime
 
@@ -9,6 +9,7 @@ class TransactionWebhook(BaseModel):
     destination_account: str
     amount: float
     currency: str
+    priority_queue: Optional[str] = None  # e.g. "webhooks.high"
 
 
 class TransactionResponse(BaseModel):
@@ -21,8 +22,7 @@ class TransactionResponse(BaseModel):
     created_at: datetime
     processed_at: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class HealthCheckResponse(BaseModel):